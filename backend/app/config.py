@@ -1,15 +1,27 @@
 # backend/app/config.py
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import PostgresDsn
+from pydantic import PostgresDsn, model_validator
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
 class Settings(BaseSettings):
-    DATABASE_URL: PostgresDsn
+    DATABASE_URL: PostgresDsn | None = None # Not needed when serving read-only from a snapshot
     POKEMONTCG_API_KEY: str | None = None
+    CATALOG_SNAPSHOT_DIR: str | None = None # Arrow snapshot of the catalog, exported after each sync
+    CATALOG_READ_ONLY: bool = False # Serve catalog reads from the snapshot, without a database
+    ADMIN_TOKEN: str | None = None # Required in the X-Admin-Token header by /admin endpoints; unset disables them
+
+    @model_validator(mode="after")
+    def check_catalog_mode(self) -> "Settings":
+        """ The database is only optional when the catalog is served read-only from a snapshot. """
+        if self.CATALOG_READ_ONLY and not self.CATALOG_SNAPSHOT_DIR:
+            raise ValueError("CATALOG_SNAPSHOT_DIR is required when CATALOG_READ_ONLY is enabled.")
+        if not self.CATALOG_READ_ONLY and not self.DATABASE_URL:
+            raise ValueError("DATABASE_URL is required unless CATALOG_READ_ONLY is enabled.")
+        return self
 
     model_config = SettingsConfigDict(
         env_file='.env',
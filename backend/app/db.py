@@ -2,24 +2,30 @@
 
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
-# from contextlib import asynccontextmanager # No longer needed here if get_session doesn't use it explicitly
+from contextlib import asynccontextmanager
 
 from .config import settings # Import settings to get the DATABASE_URL
 
 # ============================================
 # Database Engine Creation
 # ============================================
-print("DB: Creating database engine...")
-async_engine = create_async_engine(
-    str(settings.DATABASE_URL),
-    echo=False, # Set to False for less verbose logs, True for debugging SQL
-    pool_size=5,
-    max_overflow=10
-)
-# CORRECTED Print statement: Cast URL to string directly
-# Pydantic V2's DSN types should automatically mask the password on string conversion.
-print(f"DB: Database engine created for URL: {str(settings.DATABASE_URL)}")
+if settings.DATABASE_URL:
+    print("DB: Creating database engine...")
+    async_engine = create_async_engine(
+        str(settings.DATABASE_URL),
+        echo=False, # Set to False for less verbose logs, True for debugging SQL
+        pool_size=5,
+        max_overflow=10
+    )
+    # CORRECTED Print statement: Cast URL to string directly
+    # Pydantic V2's DSN types should automatically mask the password on string conversion.
+    print(f"DB: Database engine created for URL: {str(settings.DATABASE_URL)}")
+else:
+    # Only allowed in read-only snapshot mode (checked by Settings); catalog reads use no session
+    async_engine = None
+    print("DB: DATABASE_URL not set, no database engine created.")
 
 
 # ============================================
@@ -40,19 +46,46 @@ async def get_session() -> AsyncSession:
         # Note: Commit should generally happen within the endpoint logic
         # after successful operations. The session closes automatically.
 
+_session_scope = asynccontextmanager(get_session) # Same session handling, usable inside another dependency
+
+async def get_catalog_session() -> AsyncSession | None:
+    """
+    FastAPI dependency for catalog reads: a session like get_session, or None when
+    the catalog is served read-only from a snapshot (no session is opened at all).
+    """
+    if settings.CATALOG_READ_ONLY:
+        yield None
+        return
+    async with _session_scope() as session:
+        yield session
+
 # ============================================
 # Database Initialization Function
 # ============================================
+# create_all() only creates missing tables, so columns/indexes added to existing
+# tables later are applied here (idempotent, PostgreSQL syntax)
+SCHEMA_UPGRADES = [
+    "ALTER TABLE card ADD COLUMN IF NOT EXISTS sort_key VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_card_set_id_sort_key_id ON card (set_id, sort_key, id)",
+    "DROP INDEX IF EXISTS ix_card_set_id_sort_key", # Earlier two-column version of the index above
+]
+
 async def init_db():
     """
-    Initializes the database by creating tables based on SQLModel metadata.
+    Initializes the database by creating tables based on SQLModel metadata,
+    then applies SCHEMA_UPGRADES to tables that already existed.
     Called during application startup via lifespan event.
     """
+    if async_engine is None:
+        print("DB: No database engine configured, skipping table creation.")
+        return
     print("DB: Attempting to check/create database tables...")
     try:
         async with async_engine.begin() as conn:
             # await conn.run_sync(SQLModel.metadata.drop_all) # Uncomment for testing to drop tables first
             await conn.run_sync(SQLModel.metadata.create_all)
+            for statement in SCHEMA_UPGRADES:
+                await conn.execute(text(statement))
             print("DB: Database tables checked/created successfully.")
     except Exception as e:
         print(f"[ERROR] DB: An error occurred during table creation: {e}")
@@ -11,7 +11,10 @@ from fastapi.middleware.cors import CORSMiddleware # Import CORS Middleware
 # models module needs to be imported so SQLModel registers the tables
 from . import models
 from .db import init_db           # Import the DB initialization function from db.py
-from .routers import router_sets, router_cards # Import the specific routers from routers.py
+from .routers import router_sets, router_cards, router_admin # Import the specific routers from routers.py
+from .services import sync_runner
+from .config import settings
+from .snapshot import snapshot_store
 
 # ============================================
 # FastAPI Lifespan Context Manager
@@ -19,11 +22,18 @@ from .routers import router_sets, router_cards # Import the specific routers fro
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    FastAPI lifespan manager: calls database initialization on startup.
+    FastAPI lifespan manager: calls database initialization on startup (or loads the
+    catalog snapshot in read-only mode) and stops a running sync job on shutdown
+    (it resumes from its checkpoints).
     """
     print("Main: Application startup: Running lifespan tasks...")
-    await init_db() # Call the init function from db.py
+    if settings.CATALOG_READ_ONLY:
+        print("Main: Read-only mode, serving catalog from snapshot.")
+        snapshot_store.current() # Map the snapshot now instead of on the first request
+    else:
+        await init_db() # Call the init function from db.py
     yield
+    await sync_runner.shutdown()
     print("Main: Application shutdown.")
 
 # ============================================
@@ -76,5 +86,7 @@ async def read_root():
 print("Main: Including API routers...")
 app.include_router(router_sets)    # Includes all endpoints from router_sets (prefix /sets)
 app.include_router(router_cards)   # Includes all endpoints from router_cards (prefix /cards)
+if not settings.CATALOG_READ_ONLY:
+    app.include_router(router_admin)   # Includes all endpoints from router_admin (prefix /admin), needs the DB
 # Add other routers here as you create them
 print("Main: API routers included.")
\ No newline at end of file
@@ -1,7 +1,23 @@
 ﻿# backend/app/models.py
 
 from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import DateTime, Index
 from typing import List, Optional
+from datetime import datetime, timezone
+import re
+
+# Width used to zero-pad every digit run in a collector number, so that plain
+# string ordering of the sort key matches natural ordering ("2" < "10").
+SORT_KEY_DIGITS = 6
+_NUMBER_RUNS = re.compile(r"(\d+)")
+
+def card_number_sort_key(number: Optional[str]) -> str:
+    """ Builds the natural-order sort key for a collector number ("TG05" -> "TG000005"). """
+    if not number:
+        return ""
+    runs = _NUMBER_RUNS.split(number.strip().upper())
+    # With a capturing split, the digit runs are exactly the odd indices
+    return "".join(run.zfill(SORT_KEY_DIGITS) if i % 2 else run for i, run in enumerate(runs))
 
 class Set(SQLModel, table=True):
     id: str = Field(primary_key=True, index=True)
@@ -14,9 +30,14 @@ class Set(SQLModel, table=True):
     cards: List["Card"] = Relationship(back_populates="set")
 
 class Card(SQLModel, table=True):
+    # Composite index matching the /cards ORDER BY (set_id, sort_key, id), so cards of a set
+    # are returned ordered and paginated straight from it
+    __table_args__ = (Index("ix_card_set_id_sort_key_id", "set_id", "sort_key", "id"),)
+
     id: str = Field(primary_key=True, index=True)
     name: str = Field(index=True)
     number: str = Field(index=True)
+    sort_key: Optional[str] = Field(default=None) # Natural-order key for 'number', see card_number_sort_key
     rarity: Optional[str] = Field(default=None, index=True)
     type: Optional[str] = Field(default=None, index=True) # API 'supertype'
     subtype: Optional[str] = Field(default=None) # API 'subtypes' joined
@@ -26,6 +47,14 @@ class Card(SQLModel, table=True):
     set_id: str = Field(foreign_key="set.id", index=True)
     set: Set = Relationship(back_populates="cards")
 
+class SyncCheckpoint(SQLModel, table=True):
+    """ Progress of the catalog sync for one set, so an interrupted sync resumes where it stopped. """
+    set_id: str = Field(primary_key=True, foreign_key="set.id")
+    last_page: int = Field(default=0) # Last API cards page committed for this set
+    completed: bool = Field(default=False) # Set fully synced (cards + total_cards) in the current run
+    total_count: Optional[int] = Field(default=None) # API 'totalCount', so a resumed set can still update Set.total_cards
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
+
 # --- Future Models ---
 # class User(SQLModel, table=True): ...
 # class OwnedCard(SQLModel, table=True): ...
\ No newline at end of file
@@ -1,14 +1,28 @@
 # backend/app/routers.py
 
+# --- Standard Library Imports ---
+import asyncio
+import json
+import secrets
+
 # --- Third Party Imports ---
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import select, SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List # Or list
+from typing import List, Optional # Or list
 
 # --- Local Imports (Corrected) ---
-from .models import Set, Card  # Import models from models.py in the same package
-from .db import get_session    # Import the dependency function from db.py
+from .models import Set, Card, card_number_sort_key  # Import models from models.py in the same package
+from .db import get_session, get_catalog_session # Import the dependency functions from db.py
+from .config import settings
+from .snapshot import CatalogSnapshot, get_catalog_snapshot
+from .services import SyncAlreadyRunning, sync_runner
+
+def require_writable():
+    """ Dependency rejecting writes (before any DB session is opened) when the catalog is served read-only from a snapshot. """
+    if settings.CATALOG_READ_ONLY:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Catalog is served read-only from a snapshot; writes are disabled on this server.")
 
 # ============================================
 # Router for Set Endpoints
@@ -18,7 +32,7 @@ router_sets = APIRouter(
     tags=["Sets"] # Group endpoints under "Sets" in Swagger UI
 )
 
-@router_sets.post("/", response_model=Set, status_code=status.HTTP_201_CREATED)
+@router_sets.post("/", response_model=Set, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_writable)])
 async def create_set(set_data: Set, session: AsyncSession = Depends(get_session)):
     """ Creates a new Pokémon TCG Set. """
     session.add(set_data)
@@ -27,17 +41,28 @@ async def create_set(set_data: Set, session: AsyncSession = Depends(get_session)
     return set_data
 
 @router_sets.get("/", response_model=List[Set])
-async def read_sets(session: AsyncSession = Depends(get_session), skip: int = 0, limit: int = 100):
+async def read_sets(
+    session: Optional[AsyncSession] = Depends(get_catalog_session),
+    snapshot: Optional[CatalogSnapshot] = Depends(get_catalog_snapshot),
+    skip: int = 0,
+    limit: int = 100
+):
     """ Retrieves a list of all Sets. """
+    if snapshot:
+        return snapshot.list_sets(skip, limit)
     statement = select(Set).offset(skip).limit(limit)
     results = await session.exec(statement)
     sets = results.all()
     return sets
 
 @router_sets.get("/{set_id}", response_model=Set)
-async def read_set(set_id: str, session: AsyncSession = Depends(get_session)):
+async def read_set(
+    set_id: str,
+    session: Optional[AsyncSession] = Depends(get_catalog_session),
+    snapshot: Optional[CatalogSnapshot] = Depends(get_catalog_snapshot)
+):
     """ Retrieves a specific Set by ID. """
-    db_set = await session.get(Set, set_id)
+    db_set = snapshot.get_set(set_id) if snapshot else await session.get(Set, set_id)
     if not db_set:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Set with id '{set_id}' not found")
     return db_set
@@ -52,7 +77,7 @@ router_cards = APIRouter(
     tags=["Cards"] # Group endpoints under "Cards" in Swagger UI
 )
 
-@router_cards.post("/", response_model=Card, status_code=status.HTTP_201_CREATED)
+@router_cards.post("/", response_model=Card, status_code=status.HTTP_201_CREATED, dependencies=[Depends(require_writable)])
 async def create_card(card_data: Card, session: AsyncSession = Depends(get_session)):
     """ Creates a new Pokémon Card, ensuring the Set exists. """
     set_exists = await session.get(Set, card_data.set_id)
@@ -61,6 +86,7 @@ async def create_card(card_data: Card, session: AsyncSession = Depends(get_sessi
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Set with id '{card_data.set_id}' not found. Cannot create card."
         )
+    card_data.sort_key = card_number_sort_key(card_data.number) # Always derived from 'number'
     session.add(card_data)
     await session.commit()
     await session.refresh(card_data)
@@ -68,26 +94,83 @@ async def create_card(card_data: Card, session: AsyncSession = Depends(get_sessi
 
 @router_cards.get("/", response_model=List[Card])
 async def read_cards(
-    session: AsyncSession = Depends(get_session),
+    session: Optional[AsyncSession] = Depends(get_catalog_session),
+    snapshot: Optional[CatalogSnapshot] = Depends(get_catalog_snapshot),
     skip: int = 0,
     limit: int = 100,
     set_id: str | None = None
 ):
-    """ Retrieves cards, optionally filtered by set_id. """
+    """ Retrieves cards, optionally filtered by set_id, in natural collector-number order. """
+    if snapshot:
+        return snapshot.list_cards(skip, limit, set_id)
     statement = select(Card)
     if set_id:
         statement = statement.where(Card.set_id == set_id)
+    # Matches the (set_id, sort_key, id) index; id breaks ties so pagination stays stable
+    statement = statement.order_by(Card.set_id, Card.sort_key, Card.id)
     statement = statement.offset(skip).limit(limit)
     results = await session.exec(statement)
     cards = results.all()
     return cards
 
 @router_cards.get("/{card_id}", response_model=Card)
-async def read_card(card_id: str, session: AsyncSession = Depends(get_session)):
+async def read_card(
+    card_id: str,
+    session: Optional[AsyncSession] = Depends(get_catalog_session),
+    snapshot: Optional[CatalogSnapshot] = Depends(get_catalog_snapshot)
+):
     """ Retrieves a specific Card by ID. """
-    db_card = await session.get(Card, card_id)
+    db_card = snapshot.get_card(card_id) if snapshot else await session.get(Card, card_id)
     if not db_card:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Card with id '{card_id}' not found")
     return db_card
 
-# TODO: Add PUT/PATCH and DELETE endpoints for Cards later
\ No newline at end of file
+# TODO: Add PUT/PATCH and DELETE endpoints for Cards later
+
+# ============================================
+# Router for Admin Endpoints
+# ============================================
+def require_admin_token(x_admin_token: str | None = Header(default=None)):
+    """ Checks the X-Admin-Token header against ADMIN_TOKEN; admin endpoints are disabled if it is not set. """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Admin endpoints are disabled (ADMIN_TOKEN not configured).")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing admin token.")
+
+router_admin = APIRouter(
+    prefix="/admin",
+    tags=["Admin"], # Group endpoints under "Admin" in Swagger UI
+    dependencies=[Depends(require_admin_token)]
+)
+
+@router_admin.post("/sync", status_code=status.HTTP_202_ACCEPTED)
+async def start_sync(restart: bool = False):
+    """ Starts a catalog sync in the background. Resumes from checkpoints unless restart=true. """
+    try:
+        progress = await sync_runner.start(restart=restart)
+    except SyncAlreadyRunning as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return progress.to_dict()
+
+@router_admin.get("/sync")
+async def read_sync_progress():
+    """
+    Returns the progress of the current (or last) sync: counts, rate, ETA and errors.
+    Syncs run by another worker or the CLI are reported from their checkpoints ("source": "checkpoints").
+    """
+    return await sync_runner.current_progress()
+
+@router_admin.get("/sync/stream")
+async def stream_sync_progress(interval: float = 1.0):
+    """ Streams sync progress (see read_sync_progress) as Server-Sent Events until the sync stops running. """
+    interval = min(max(interval, 0.2), 30.0)
+
+    async def event_stream():
+        while True:
+            progress = await sync_runner.current_progress()
+            yield f"data: {json.dumps(progress)}\n\n"
+            if progress["status"] != "running":
+                break
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
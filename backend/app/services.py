@@ -16,3 +16,443 @@
 # - ROI calculation
 # - Pack opening simulation logic
 # - PSA verification scraping (if chosen, with caveats)
+
+# --- Standard Library Imports ---
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+
+# --- Third Party Imports ---
+import httpx
+from sqlalchemy import delete, text
+from sqlmodel import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# --- Local Imports ---
+from .config import settings
+from .db import async_engine
+from .models import Set, Card, SyncCheckpoint, card_number_sort_key
+from .snapshot import export_catalog_snapshot
+
+# ============================================
+# Catalog Sync (PokemonTCG.io API -> DB)
+# ============================================
+POKEMONTCG_API_V2_SETS_URL = "https://api.pokemontcg.io/v2/sets"
+POKEMONTCG_API_V2_CARDS_URL = "https://api.pokemontcg.io/v2/cards"
+PAGE_SIZE = 250
+# Postgres advisory lock key shared by every process that runs a sync (API workers and CLI script)
+SYNC_ADVISORY_LOCK_KEY = 726_001
+MAX_SYNC_ERRORS_KEPT = 100
+
+class SyncAlreadyRunning(Exception):
+    """ Raised when a sync is started while another one holds the sync lock. """
+
+@dataclass
+class SyncProgress:
+    """ Live progress of one sync run, shared between the job and the /admin/sync endpoints. """
+    status: str = "idle" # idle | running | finished | failed
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    sets_total: int = 0
+    sets_done: int = 0
+    sets_resumed: int = 0 # Sets already completed by an interrupted run, skipped via checkpoint
+    current_set: Optional[str] = None
+    pages_fetched: int = 0
+    cards_added: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def add_error(self, message: str):
+        print(f"  SYNC ERROR: {message}")
+        self.errors.append(message)
+        del self.errors[:-MAX_SYNC_ERRORS_KEPT] # Keep only the most recent errors
+
+    def to_dict(self) -> dict:
+        """ Serializable view of the progress, including rate and ETA for the sets still to process. """
+        end = self.finished_at or datetime.now(timezone.utc)
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+        sets_processed = self.sets_done - self.sets_resumed # Only sets actually synced by this run count for the rate
+        sets_per_second = sets_processed / elapsed if elapsed > 0 else 0.0
+        sets_remaining = max(self.sets_total - self.sets_done, 0)
+        eta_seconds = None
+        if self.status == "running" and sets_per_second > 0:
+            eta_seconds = round(sets_remaining / sets_per_second, 1)
+        return {
+            "status": self.status,
+            "source": "local", # Tracked live by the job running in this process
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "sets_total": self.sets_total,
+            "sets_done": self.sets_done,
+            "sets_resumed": self.sets_resumed,
+            "current_set": self.current_set,
+            "pages_fetched": self.pages_fetched,
+            "cards_added": self.cards_added,
+            "sets_per_minute": round(sets_per_second * 60, 2),
+            "cards_per_second": round(self.cards_added / elapsed, 2) if elapsed > 0 else 0.0,
+            "eta_seconds": eta_seconds,
+            "error_count": len(self.errors),
+            "errors": list(self.errors),
+        }
+
+async def populate_sets_basic(session: AsyncSession, progress: SyncProgress) -> List[str]:
+    """ Fetches sets, adds new ones, ignores total_cards. Returns list of set IDs in DB. """
+    print("--- Starting Set Population (Basic Info Only) ---")
+    set_ids_in_db = set()
+    try:
+        existing_sets_result = await session.exec(select(Set.id))
+        set_ids_in_db = set(existing_sets_result.all())
+        print(f"Found {len(set_ids_in_db)} existing sets in DB.")
+    except Exception as e:
+        progress.add_error(f"Error fetching existing set IDs from DB: {e}")
+    if not settings.POKEMONTCG_API_KEY:
+        progress.add_error("POKEMONTCG_API_KEY not found. Skipping set processing.")
+        return sorted(set_ids_in_db)
+
+    headers = {"X-Api-Key": settings.POKEMONTCG_API_KEY}
+    page = 1; total_fetched = 0; new_sets_added_count = 0; processed_set_ids_api = set()
+    async with httpx.AsyncClient(headers=headers, timeout=60.0) as client:
+        while True:
+            print(f"Fetching sets page {page}...")
+            params = {'page': page, 'pageSize': PAGE_SIZE}
+            try:
+                response = await client.get(POKEMONTCG_API_V2_SETS_URL, params=params)
+                response.raise_for_status()
+                api_sets = response.json().get('data', [])
+            except httpx.HTTPStatusError as exc: progress.add_error(f"HTTP error fetching sets (page {page}): {exc.response.status_code}. Stopping."); break
+            except Exception as exc: progress.add_error(f"Error during set fetching/processing page {page}: {exc}. Stopping."); break
+            if not api_sets: print("No more sets found from API."); break
+            current_page_fetched = len(api_sets); total_fetched += current_page_fetched
+            print(f"Fetched {current_page_fetched} sets page {page}. Total: {total_fetched}")
+            new_sets_in_batch = []
+            for api_set_data in api_sets:
+                set_id = api_set_data.get('id')
+                if not set_id or set_id in processed_set_ids_api: continue
+                processed_set_ids_api.add(set_id)
+                if set_id not in set_ids_in_db:
+                    new_set = Set(id=set_id, name=api_set_data.get('name'), series=api_set_data.get('series'), release_date=api_set_data.get('releaseDate'), total_cards=None, logo_url=api_set_data.get('images', {}).get('logo'), symbol_url=api_set_data.get('images', {}).get('symbol'))
+                    new_sets_in_batch.append(new_set)
+            if new_sets_in_batch:
+                added_ids = {s.id for s in new_sets_in_batch}
+                session.add_all(new_sets_in_batch)
+                try: await session.commit(); set_ids_in_db.update(added_ids); new_sets_added_count += len(added_ids); print(f"  Added {len(added_ids)} new sets page {page}.")
+                except Exception as e: progress.add_error(f"Error committing sets page {page}: {e}. Rolling back."); await session.rollback()
+            page += 1
+            if current_page_fetched < PAGE_SIZE: print("Reached last page of sets."); break
+    print(f"--- Set Population Finished ---"); print(f"New sets added: {new_sets_added_count}. Total sets in DB: {len(set_ids_in_db)}")
+    return sorted(set_ids_in_db)
+
+async def _save_checkpoint(session: AsyncSession, set_id: str, last_page: int, total_count: Optional[int], completed: bool = False):
+    """ Stages the checkpoint for a set; it is committed together with the data it describes. """
+    await session.merge(SyncCheckpoint(set_id=set_id, last_page=last_page, completed=completed, total_count=total_count, updated_at=datetime.now(timezone.utc)))
+
+async def populate_cards_and_update_set_counts(session: AsyncSession, set_ids_to_process: List[str], progress: SyncProgress) -> Optional[List[str]]:
+    """
+    Fetches cards, saves new ones, AND updates Set total_cards count.
+    Every cards page is committed together with its SyncCheckpoint, so an interrupted
+    run resumes at the next page of the set it was on; completed sets are skipped.
+    Returns the IDs of the sets that failed, or None if no set could be processed at all.
+    """
+    print(f"\n--- Starting Card Population & Set Count Update for {len(set_ids_to_process)} sets ---")
+    progress.sets_total = len(set_ids_to_process)
+    if not settings.POKEMONTCG_API_KEY: progress.add_error("POKEMONTCG_API_KEY not found."); return None
+
+    headers = {"X-Api-Key": settings.POKEMONTCG_API_KEY}
+    sets_updated_count = 0; failed_set_ids = []
+
+    try: existing_cards_result = await session.exec(select(Card.id)); existing_card_ids = set(existing_cards_result.all()); print(f"Found {len(existing_card_ids)} existing cards in DB.")
+    except Exception as e: progress.add_error(f"Error fetching existing card IDs: {e}."); existing_card_ids = set()
+
+    # Plain values only: ORM objects are expired by every commit below and can't lazy-load in async
+    checkpoints_result = await session.exec(select(SyncCheckpoint))
+    checkpoints = {cp.set_id: (cp.last_page, cp.completed, cp.total_count) for cp in checkpoints_result.all()}
+    if checkpoints: print(f"Resuming from checkpoints for {len(checkpoints)} sets.")
+
+    async with httpx.AsyncClient(headers=headers, timeout=120.0) as client:
+        for i, set_id in enumerate(set_ids_to_process):
+            last_page, completed, saved_total_count = checkpoints.get(set_id, (0, False, None))
+            if completed:
+                progress.sets_done += 1; progress.sets_resumed += 1
+                continue
+            print(f"\nProcessing Set {i+1}/{len(set_ids_to_process)}: {set_id} (starting at page {last_page + 1})")
+            progress.current_set = set_id
+            page = last_page + 1; set_cards_added_this_run = 0; processed_card_ids_api = set()
+            # Resuming after the set's last page leaves only empty pages to fetch, so start from the saved count
+            current_set_total_count = saved_total_count; set_failed = False
+
+            while True: # Loop through card pages for this set
+                query = f'set.id:{set_id}'; params = {'q': query, 'page': page, 'pageSize': PAGE_SIZE, 'orderBy': 'number'}
+                print(f"  Fetching cards page {page} for set {set_id}...")
+                try: response = await client.get(POKEMONTCG_API_V2_CARDS_URL, params=params); response.raise_for_status(); data = response.json(); api_cards = data.get('data', [])
+                except httpx.HTTPStatusError as exc: progress.add_error(f"HTTP error fetching cards for set {set_id} page {page}: {exc.response.status_code}. Skipping set."); set_failed = True; break
+                except Exception as exc: progress.add_error(f"Error fetching/processing cards for set {set_id} page {page}: {exc}. Skipping set."); set_failed = True; break
+                if not api_cards: break
+
+                # Every page carries totalCount, so a resumed set still gets its count
+                current_set_total_count = data.get('totalCount')
+                current_page_fetched = len(api_cards)
+
+                cards_added_in_page = []
+                for api_card_data in api_cards:
+                    card_id = api_card_data.get('id')
+                    if not card_id or card_id in processed_card_ids_api: continue
+                    processed_card_ids_api.add(card_id)
+                    if card_id not in existing_card_ids:
+                        # --- Map data ---
+                        card_hp_str = api_card_data.get('hp'); card_hp = int(card_hp_str) if card_hp_str and card_hp_str.isdigit() else None
+                        subtypes_list = api_card_data.get('subtypes', []); card_subtype = ','.join(subtypes_list) if subtypes_list else None
+                        new_card = Card(id=card_id, name=api_card_data.get('name'), number=api_card_data.get('number'), sort_key=card_number_sort_key(api_card_data.get('number')), rarity=api_card_data.get('rarity'), type=api_card_data.get('supertype'), subtype=card_subtype, hp=card_hp, image_url_small=api_card_data.get('images', {}).get('small'), image_url_large=api_card_data.get('images', {}).get('large'), set_id=set_id)
+                        cards_added_in_page.append(new_card)
+
+                # Commit the page's cards together with its checkpoint
+                new_ids = {c.id for c in cards_added_in_page}
+                session.add_all(cards_added_in_page)
+                await _save_checkpoint(session, set_id, page, current_set_total_count)
+                try:
+                    await session.commit()
+                except Exception as e:
+                    progress.add_error(f"Error committing cards page {page} for set {set_id}: {e}. Rolling back and skipping set.")
+                    await session.rollback(); set_failed = True; break
+                existing_card_ids.update(new_ids)
+                set_cards_added_this_run += len(new_ids)
+                progress.pages_fetched += 1; progress.cards_added += len(new_ids)
+                print(f"  Fetched {current_page_fetched} cards page {page}. Added {len(new_ids)}. Checkpoint saved.")
+
+                page += 1
+                if current_page_fetched < PAGE_SIZE: break
+
+            if set_failed:
+                # Checkpoint stays at the last committed page; the next run retries from there
+                failed_set_ids.append(set_id); progress.sets_done += 1
+                continue
+
+            # --- AFTER processing all cards for the set ---
+            # Fetch the Set from DB AGAIN (earlier commits expired it) and update its count if needed
+            set_updated_this_run = False
+            if current_set_total_count is not None:
+                try:
+                    db_set_to_update = await session.get(Set, set_id)
+                    if db_set_to_update:
+                        count_to_save = int(current_set_total_count)
+                        if db_set_to_update.total_cards != count_to_save:
+                            print(f"  Updating Set {set_id} total_cards from {db_set_to_update.total_cards} to {count_to_save}")
+                            db_set_to_update.total_cards = count_to_save
+                            session.add(db_set_to_update)
+                            set_updated_this_run = True
+                            sets_updated_count += 1
+                    else:
+                        print(f"  Warning: Set {set_id} not found in DB when trying to update count.")
+                except (ValueError, TypeError): print(f"  Warning: Could not convert totalCount '{current_set_total_count}' to int for set {set_id}.")
+                except Exception as e: progress.add_error(f"Error fetching/updating set {set_id} count: {e}")
+
+            # Mark the set as completed in the same commit as its count update
+            await _save_checkpoint(session, set_id, page - 1, current_set_total_count, completed=True)
+            try:
+                await session.commit()
+                print(f"Finished processing set {set_id}. Added: {set_cards_added_this_run} cards. Updated Count: {'Yes' if set_updated_this_run else 'No'}. COMMIT OK.")
+            except Exception as e:
+                progress.add_error(f"Error committing set {set_id} completion: {e}. Rolling back.")
+                await session.rollback(); failed_set_ids.append(set_id)
+            progress.sets_done += 1
+
+    progress.current_set = None
+    print(f"\n--- Card Population & Set Count Update Finished ---")
+    print(f"Total new cards added to DB this run: {progress.cards_added}")
+    print(f"Total sets updated with card count this run: {sets_updated_count}")
+    print(f"Sets skipped via checkpoint: {progress.sets_resumed}. Sets failed: {len(failed_set_ids)} {failed_set_ids or ''}")
+    print(f"Total cards now in DB: {len(existing_card_ids)}")
+    return failed_set_ids
+
+async def clear_sync_checkpoints(session: AsyncSession, keep_set_ids: Optional[List[str]] = None):
+    """
+    Deletes checkpoints, so the next sync processes every set again. Checkpoints of
+    keep_set_ids (sets that failed mid-way) are kept, so those sets resume at their page.
+    """
+    statement = delete(SyncCheckpoint)
+    if keep_set_ids:
+        statement = statement.where(SyncCheckpoint.set_id.not_in(keep_set_ids))
+    await session.execute(statement)
+    await session.commit()
+
+async def acquire_sync_lock() -> AsyncConnection:
+    """
+    Takes the cross-process sync lock and returns the connection holding it.
+    Raises SyncAlreadyRunning if another process (API worker or CLI) holds it.
+    """
+    # Session-level advisory lock on a dedicated connection: released on unlock or if the connection dies.
+    # AUTOCOMMIT so the connection is never left "idle in transaction" during an hours-long sync.
+    lock_conn = await async_engine.connect()
+    try:
+        await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        lock_result = await lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SYNC_ADVISORY_LOCK_KEY})
+        locked = lock_result.scalar()
+    except BaseException:
+        await lock_conn.close()
+        raise
+    if not locked:
+        await lock_conn.close()
+        raise SyncAlreadyRunning("Another catalog sync is already running.")
+    return lock_conn
+
+async def release_sync_lock(lock_conn: AsyncConnection):
+    """ Releases the sync lock and closes its connection. """
+    try:
+        await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SYNC_ADVISORY_LOCK_KEY})
+    except BaseException:
+        # Never return a connection that may still hold the lock to the pool
+        await lock_conn.invalidate()
+        raise
+    finally:
+        await lock_conn.close()
+
+async def run_sync(progress: Optional[SyncProgress] = None, restart: bool = False, lock_conn: Optional[AsyncConnection] = None) -> SyncProgress:
+    """
+    Runs a full catalog sync (sets, then cards + set counts) under the sync lock.
+    Resumes an interrupted run from its checkpoints unless restart=True. Once a run reaches
+    the end of the set list, checkpoints are cleared (except page checkpoints of the sets that
+    failed), so the following run processes every set again.
+    Takes the lock itself unless lock_conn (from acquire_sync_lock) is given; releases it either way.
+    Raises SyncAlreadyRunning if another process is syncing.
+    """
+    progress = progress or SyncProgress()
+    if lock_conn is None:
+        lock_conn = await acquire_sync_lock()
+    try:
+        progress.status = "running"; progress.started_at = datetime.now(timezone.utc)
+        async with AsyncSession(async_engine) as session:
+            if restart:
+                print("Sync: restart requested, clearing checkpoints.")
+                await clear_sync_checkpoints(session)
+            set_ids = await populate_sets_basic(session, progress)
+            failed_set_ids = None
+            if set_ids:
+                failed_set_ids = await populate_cards_and_update_set_counts(session, set_ids, progress)
+            else:
+                progress.add_error("No sets found in DB to populate cards for.")
+            if failed_set_ids is not None:
+                # The run reached the end of the set list: only a failed set may resume next time
+                await clear_sync_checkpoints(session, keep_set_ids=failed_set_ids)
+            if settings.CATALOG_SNAPSHOT_DIR:
+                # Snapshot even after a partial sync: it reflects what is in the DB now
+                try: await export_catalog_snapshot(session, settings.CATALOG_SNAPSHOT_DIR)
+                except Exception as e: progress.add_error(f"Error exporting catalog snapshot: {e}")
+        progress.status = "finished"
+    except BaseException as e: # Also covers cancellation on app shutdown
+        progress.status = "failed"
+        progress.add_error(f"Sync aborted: {e!r}")
+        raise
+    finally:
+        progress.finished_at = datetime.now(timezone.utc)
+        await release_sync_lock(lock_conn)
+    return progress
+
+async def is_sync_locked(session: AsyncSession) -> bool:
+    """ True if any process (this one included) currently holds the sync advisory lock. """
+    # A bigint advisory key is stored as classid = high 32 bits, objid = low 32 bits
+    result = await session.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted AND classid = :high AND objid = :low AND objsubid = 1)"),
+        {"high": SYNC_ADVISORY_LOCK_KEY >> 32, "low": SYNC_ADVISORY_LOCK_KEY & 0xFFFFFFFF}
+    )
+    return bool(result.scalar())
+
+async def read_persisted_sync_progress(session: AsyncSession) -> dict:
+    """
+    Progress derived from the sync lock and the SyncCheckpoint rows, for syncs run by another
+    process (another API worker or the CLI script). Same keys as SyncProgress.to_dict(); errors
+    and card counts are only known to the process running the job.
+    """
+    running = await is_sync_locked(session)
+    checkpoints = (await session.exec(select(SyncCheckpoint))).all()
+    sets_total = (await session.exec(select(func.count()).select_from(Set))).one()
+    sets_done = sum(1 for cp in checkpoints if cp.completed)
+    in_progress = [cp for cp in checkpoints if not cp.completed]
+
+    # timestamptz comes back aware from PostgreSQL; treat naive values (other backends) as UTC too
+    updated = [cp.updated_at if cp.updated_at.tzinfo else cp.updated_at.replace(tzinfo=timezone.utc) for cp in checkpoints]
+    started_at = min(updated, default=None)
+    last_checkpoint_at = max(updated, default=None)
+    end = datetime.now(timezone.utc) if running else last_checkpoint_at
+    elapsed = (end - started_at).total_seconds() if started_at and end else 0.0
+    sets_per_second = sets_done / elapsed if elapsed > 0 else 0.0
+    eta_seconds = None
+    if running and sets_per_second > 0:
+        eta_seconds = round(max(sets_total - sets_done, 0) / sets_per_second, 1)
+
+    if running: status = "running"
+    elif checkpoints: status = "interrupted" # Next sync resumes from these checkpoints
+    else: status = "idle"
+    return {
+        "status": status,
+        "source": "checkpoints",
+        "started_at": started_at.isoformat() if started_at else None, # First checkpoint of the run
+        "finished_at": None,
+        "last_checkpoint_at": last_checkpoint_at.isoformat() if last_checkpoint_at else None,
+        "elapsed_seconds": round(elapsed, 1),
+        "sets_total": sets_total,
+        "sets_done": sets_done,
+        "sets_resumed": None,
+        "current_set": max(in_progress, key=lambda cp: cp.updated_at).set_id if running and in_progress else None,
+        "pages_fetched": None,
+        "cards_added": None,
+        "sets_per_minute": round(sets_per_second * 60, 2),
+        "cards_per_second": None,
+        "eta_seconds": eta_seconds,
+        "error_count": None,
+        "errors": [],
+    }
+
+class SyncJobRunner:
+    """ Runs run_sync() as a single in-app background task and exposes its progress. """
+
+    def __init__(self):
+        self.progress = SyncProgress()
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, restart: bool = False) -> SyncProgress:
+        """
+        Takes the sync lock and starts a sync in the background.
+        Raises SyncAlreadyRunning if this app or another process is already syncing.
+        """
+        async with self._start_lock: # No second start while awaiting the lock below
+            if self.is_running:
+                raise SyncAlreadyRunning("A catalog sync is already running.")
+            lock_conn = await acquire_sync_lock()
+            self.progress = SyncProgress(status="running", started_at=datetime.now(timezone.utc))
+            self._task = asyncio.create_task(self._run(restart, lock_conn))
+            return self.progress
+
+    async def _run(self, restart: bool, lock_conn: AsyncConnection):
+        try:
+            await run_sync(self.progress, restart=restart, lock_conn=lock_conn)
+        except Exception as e:
+            print(f"[ERROR] Sync job failed: {e}") # Already recorded in progress by run_sync
+
+    async def current_progress(self) -> dict:
+        """
+        Progress of the job in this process while it runs. Otherwise another process may be
+        syncing (with several API workers, or the CLI), so the status comes from the lock and
+        checkpoints; the last local run is reported only when nothing else is going on.
+        """
+        if self.is_running:
+            return self.progress.to_dict()
+        async with AsyncSession(async_engine) as session:
+            persisted = await read_persisted_sync_progress(session)
+        if persisted["status"] == "running" or self.progress.status == "idle":
+            return persisted
+        return self.progress.to_dict()
+
+    async def shutdown(self):
+        """ Cancels a running sync; its checkpoints let the next run resume. """
+        if self.is_running:
+            self._task.cancel()
+            try: await self._task
+            except asyncio.CancelledError: pass
+
+sync_runner = SyncJobRunner()
@@ -0,0 +1,260 @@
+# backend/app/snapshot.py
+
+# --- Standard Library Imports ---
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# --- Third Party Imports ---
+from fastapi import HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError: # Optional dependency: only needed for catalog snapshots
+    pa = None
+
+# --- Local Imports ---
+from .config import settings
+from .models import Set, Card
+
+# ============================================
+# Catalog Snapshot Layout
+# ============================================
+# A snapshot directory holds one uncompressed Arrow IPC file per table plus a manifest
+# naming the current pair. Files are versioned and never rewritten in place; replacing
+# the manifest (os.replace) is the atomic swap, so readers always see a matching pair.
+SNAPSHOT_MANIFEST = "manifest.json"
+
+SET_COLUMNS = ["id", "name", "series", "release_date", "total_cards", "logo_url", "symbol_url"]
+CARD_COLUMNS = ["id", "name", "number", "sort_key", "rarity", "type", "subtype", "hp", "image_url_small", "image_url_large", "set_id"]
+INT_COLUMNS = {"total_cards", "hp"}
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed. Install it ('pip install pyarrow') to use catalog snapshots.")
+
+def _schema(columns: List[str]) -> "pa.Schema":
+    return pa.schema([(name, pa.int64() if name in INT_COLUMNS else pa.string()) for name in columns])
+
+def _write_table(path: str, columns: List[str], rows: List[tuple]):
+    """ Writes rows as an Arrow IPC file; uncompressed so it can be memory-mapped zero-copy. """
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    schema = _schema(columns)
+    table = pa.Table.from_arrays([pa.array(col, type=schema.field(name).type) for name, col in zip(columns, values)], schema=schema)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(table)
+    _fsync_file(path)
+
+def _fsync_file(path: str):
+    """ Flushes a written file to disk, so the manifest never points at a truncated file after a crash. """
+    fd = os.open(path, os.O_RDWR)
+    try: os.fsync(fd)
+    finally: os.close(fd)
+
+def _fsync_dir(path: str):
+    """ Makes renames inside the directory durable. Directories cannot be opened for fsync on Windows. """
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try: os.fsync(fd)
+    finally: os.close(fd)
+
+def _read_manifest(snapshot_dir: str) -> dict:
+    with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+# ============================================
+# Snapshot Export (DB -> Arrow IPC)
+# ============================================
+async def export_catalog_snapshot(session: AsyncSession, snapshot_dir: str) -> dict:
+    """
+    Exports the Set and Card tables to a new snapshot version and atomically makes it current.
+    Cards are written in API order (set_id, sort_key, id), so each set is a contiguous slice.
+    Callers must hold the sync lock (services.acquire_sync_lock), so exports never overlap
+    and a slower export can't swap the manifest back to an older version.
+    Returns the new manifest.
+    """
+    _require_pyarrow()
+    print(f"Snapshot: Exporting catalog to {snapshot_dir}...")
+
+    set_rows = (await session.exec(select(*[getattr(Set, c) for c in SET_COLUMNS]).order_by(Set.id))).all()
+    card_rows = (await session.exec(select(*[getattr(Card, c) for c in CARD_COLUMNS]).order_by(Card.set_id, Card.sort_key, Card.id))).all()
+
+    # Arrow writes and fsyncs block, so keep them off the event loop (the API runs syncs in-process)
+    manifest = await asyncio.to_thread(_write_snapshot_files, snapshot_dir, set_rows, card_rows)
+    print(f"Snapshot: Version {manifest['version']} is current ({len(set_rows)} sets, {len(card_rows)} cards).")
+    return manifest
+
+def _write_snapshot_files(snapshot_dir: str, set_rows: List[tuple], card_rows: List[tuple]) -> dict:
+    """ Writes a new snapshot version, swaps the manifest to it and prunes older versions. Blocking. """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    try: previous_version = _read_manifest(snapshot_dir)["version"]
+    except (OSError, ValueError, KeyError): previous_version = None
+
+    created_at = datetime.now(timezone.utc)
+    version = created_at.strftime("%Y%m%dT%H%M%S%fZ")
+    manifest = {
+        "version": version,
+        "created_at": created_at.isoformat(),
+        "sets_file": f"sets-{version}.arrow",
+        "cards_file": f"cards-{version}.arrow",
+        "sets_count": len(set_rows),
+        "cards_count": len(card_rows),
+    }
+    _write_table(os.path.join(snapshot_dir, manifest["sets_file"]), SET_COLUMNS, set_rows)
+    _write_table(os.path.join(snapshot_dir, manifest["cards_file"]), CARD_COLUMNS, card_rows)
+
+    # Atomic swap: readers open the manifest first, then the files it names (already fsynced above)
+    manifest_tmp = os.path.join(snapshot_dir, f"{SNAPSHOT_MANIFEST}.{version}.tmp")
+    with open(manifest_tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(manifest_tmp, os.path.join(snapshot_dir, SNAPSHOT_MANIFEST))
+    _fsync_dir(snapshot_dir)
+
+    # Keep the new version and the one it replaced, which readers may still have mapped
+    _prune_old_versions(snapshot_dir, keep_versions={version, previous_version})
+    return manifest
+
+def _prune_old_versions(snapshot_dir: str, keep_versions: set):
+    """
+    Deletes snapshot files of every version not in keep_versions. Versions are chosen from
+    the manifest, not by sorting names, which would break if the clock stepped back.
+    """
+    try: current = _read_manifest(snapshot_dir)
+    except (OSError, ValueError): return # Never delete anything without knowing what is current
+    keep_files = {current.get("sets_file"), current.get("cards_file")}
+    keep_files.update(f"{prefix}-{v}.arrow" for v in keep_versions if v for prefix in ("sets", "cards"))
+    for name in os.listdir(snapshot_dir):
+        if name.endswith(".arrow") and name not in keep_files:
+            try: os.remove(os.path.join(snapshot_dir, name))
+            except OSError: pass # Still mapped by a reader (Windows) or already gone; retried next export
+
+# ============================================
+# Snapshot Reader (memory-mapped, read-only)
+# ============================================
+class CatalogSnapshot:
+    """
+    Read-only view of one snapshot version. Tables are memory-mapped (zero-copy), so
+    analytics code can use them directly: snapshot.cards.to_pandas(), snapshot.cards.column("hp").to_numpy().
+    Lookups by id and set_id go through in-memory indexes built on load.
+    """
+
+    def __init__(self, snapshot_dir: str):
+        _require_pyarrow()
+        manifest = _read_manifest(snapshot_dir)
+        self.version: str = manifest["version"]
+        self.sets: "pa.Table" = self._map_table(os.path.join(snapshot_dir, manifest["sets_file"]))
+        self.cards: "pa.Table" = self._map_table(os.path.join(snapshot_dir, manifest["cards_file"]))
+
+        self._set_rows: Dict[str, int] = {set_id: i for i, set_id in enumerate(self.sets.column("id").to_pylist())}
+        self._card_rows: Dict[str, int] = {}
+        self._set_card_ranges: Dict[str, Tuple[int, int]] = {} # set_id -> (start, stop) in cards, which are sorted by set_id
+        for i, (card_id, set_id) in enumerate(zip(self.cards.column("id").to_pylist(), self.cards.column("set_id").to_pylist())):
+            self._card_rows[card_id] = i
+            start, _ = self._set_card_ranges.get(set_id, (i, i))
+            self._set_card_ranges[set_id] = (start, i + 1)
+
+    @staticmethod
+    def _map_table(path: str) -> "pa.Table":
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).read_all() # Buffers keep referencing the mapping
+
+    @staticmethod
+    def _rows(table: "pa.Table", start: int, stop: int) -> List[dict]:
+        if stop <= start:
+            return []
+        return table.slice(start, stop - start).to_pylist()
+
+    def get_set(self, set_id: str) -> Optional[Set]:
+        i = self._set_rows.get(set_id)
+        return None if i is None else Set(**self._rows(self.sets, i, i + 1)[0])
+
+    def list_sets(self, skip: int = 0, limit: int = 100) -> List[Set]:
+        start = max(skip, 0)
+        return [Set(**row) for row in self._rows(self.sets, start, min(start + max(limit, 0), self.sets.num_rows))]
+
+    def get_card(self, card_id: str) -> Optional[Card]:
+        i = self._card_rows.get(card_id)
+        return None if i is None else Card(**self._rows(self.cards, i, i + 1)[0])
+
+    def list_cards(self, skip: int = 0, limit: int = 100, set_id: Optional[str] = None) -> List[Card]:
+        """ Same order as the DB endpoint: (set_id, sort_key, id). """
+        if set_id:
+            if set_id not in self._set_card_ranges:
+                return []
+            first, last = self._set_card_ranges[set_id]
+        else:
+            first, last = 0, self.cards.num_rows
+        start = first + max(skip, 0)
+        return [Card(**row) for row in self._rows(self.cards, start, min(start + max(limit, 0), last))]
+
+class CatalogSnapshotStore:
+    """
+    Holds the current CatalogSnapshot and reloads it when the manifest is swapped.
+    Thread-safe: the dependency runs in FastAPI's threadpool, and only one thread reloads.
+    """
+
+    def __init__(self, snapshot_dir: Optional[str]):
+        self.snapshot_dir = snapshot_dir
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._manifest_mtime: Optional[int] = None
+        self._reload_lock = threading.Lock()
+
+    def _manifest_mtime_now(self) -> Optional[int]:
+        try: return os.stat(os.path.join(self.snapshot_dir, SNAPSHOT_MANIFEST)).st_mtime_ns
+        except FileNotFoundError: return None
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """
+        Returns the current snapshot (None if none was exported yet), reloading after a swap.
+        If a reload fails, the previous snapshot keeps being served until the next swap;
+        the error is only raised when no snapshot has been loaded yet.
+        """
+        if not self.snapshot_dir:
+            return None
+        mtime = self._manifest_mtime_now()
+        if mtime is None or mtime == self._manifest_mtime:
+            return self._snapshot
+        with self._reload_lock:
+            # Re-check: another thread may have reloaded while this one waited for the lock
+            mtime = self._manifest_mtime_now()
+            if mtime is not None and mtime != self._manifest_mtime:
+                try:
+                    snapshot = CatalogSnapshot(self.snapshot_dir)
+                except Exception as e:
+                    if self._snapshot is None:
+                        raise
+                    print(f"[ERROR] Snapshot: Could not load new snapshot ({e!r}); still serving version {self._snapshot.version}.")
+                    self._manifest_mtime = mtime # Don't retry on every request; the next swap changes the mtime
+                    return self._snapshot
+                if self._snapshot is None or snapshot.version != self._snapshot.version:
+                    print(f"Snapshot: Serving catalog version {snapshot.version}.")
+                    self._snapshot = snapshot
+                self._manifest_mtime = mtime
+            return self._snapshot
+
+snapshot_store = CatalogSnapshotStore(settings.CATALOG_SNAPSHOT_DIR)
+
+# ============================================
+# Snapshot Dependency
+# ============================================
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """
+    FastAPI dependency: the snapshot to answer catalog reads from in read-only mode, or None
+    when reads should go to the database.
+    """
+    if not settings.CATALOG_READ_ONLY:
+        return None
+    snapshot = snapshot_store.current()
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Catalog snapshot not available yet.")
+    return snapshot
@@ -0,0 +1,83 @@
+# backend/scripts/backfill_sort_keys.py
+
+print("DEBUG: Starting execution of backfill_sort_keys.py script file...")
+
+import asyncio
+import sys
+import os
+
+# --- Adjust Python Path ---
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(script_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+print(f"DEBUG: Python Path includes: {backend_dir}")
+# --- End Path Adjustment ---
+
+try:
+    # --- Local Imports ---
+    from sqlmodel import select
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.db import async_engine, init_db
+    from app.models import Card, card_number_sort_key
+    print("DEBUG: Local modules imported successfully.")
+except ImportError as e:
+    print(f"ERROR: Could not import local modules. Run from 'backend' dir: 'python -m scripts.backfill_sort_keys'. Error: {e}")
+    sys.exit(1)
+
+# Constants
+BATCH_SIZE = 1000
+
+async def backfill_sort_keys(session: AsyncSession):
+    """
+    Fills 'sort_key' for every card that does not have one yet, committing in batches.
+    Needed once for cards stored before the column existed; new cards get it on insert.
+    """
+    print("--- Starting Card Sort Key Backfill ---")
+    updated_count = 0
+
+    while True:
+        # Always take the next batch of NULL rows: updated rows drop out of the filter
+        statement = select(Card).where(Card.sort_key == None).limit(BATCH_SIZE)
+        results = await session.exec(statement)
+        cards_to_update = results.all()
+        if not cards_to_update:
+            break
+
+        for db_card in cards_to_update:
+            db_card.sort_key = card_number_sort_key(db_card.number)
+            session.add(db_card)
+
+        try:
+            await session.commit()
+            updated_count += len(cards_to_update)
+            print(f"--- Committed batch of {len(cards_to_update)} cards (total {updated_count}) ---")
+        except Exception as e:
+            print(f"\nERROR committing batch: {e}. Rolling back and stopping.")
+            await session.rollback()
+            break
+
+    print(f"--- Card Sort Key Backfill Finished ---")
+    print(f"Sort key filled in for {updated_count} cards.")
+
+
+async def main():
+    """Main async function to run the backfill task."""
+    await init_db() # Adds the 'sort_key' column and index to an existing 'card' table
+    print("Backfill Script: Creating session...")
+    async with AsyncSession(async_engine) as session:
+        print("Session created. Starting backfill...")
+        await backfill_sort_keys(session)
+        print("Backfill task finished.")
+
+
+if __name__ == "__main__":
+    print("Running Card Sort Key Backfill Script...")
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        print(f"\n[CRITICAL ERROR] An error occurred in the main execution block: {e}")
+        import traceback
+        print(traceback.format_exc())
+    finally:
+        print("\nBackfill script execution attempt finished.")
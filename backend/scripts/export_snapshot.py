@@ -0,0 +1,61 @@
+# backend/scripts/export_snapshot.py
+
+print("DEBUG: Starting execution of export_snapshot.py script file...")
+
+import asyncio
+import sys
+import os
+
+# --- Adjust Python Path ---
+script_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(script_dir)
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+print(f"DEBUG: Python Path includes: {backend_dir}")
+# --- End Path Adjustment ---
+
+try:
+    # --- Local Imports ---
+    from sqlmodel.ext.asyncio.session import AsyncSession
+    from app.config import settings
+    from app.db import async_engine
+    from app.services import SyncAlreadyRunning, acquire_sync_lock, release_sync_lock
+    from app.snapshot import export_catalog_snapshot
+    print("DEBUG: Local modules imported successfully.")
+except ImportError as e:
+    print(f"ERROR: Could not import local modules. Run from 'backend' dir: 'python -m scripts.export_snapshot'. Error: {e}")
+    sys.exit(1)
+
+
+async def main(snapshot_dir: str):
+    """Exports the catalog (Set and Card tables) to a new Arrow snapshot version."""
+    # Same lock as the sync (which exports at its end), so exports never overlap
+    try:
+        lock_conn = await acquire_sync_lock()
+    except SyncAlreadyRunning as e:
+        print(f"ERROR: {e} It exports a snapshot when it finishes; try again later if needed.")
+        return
+    try:
+        print("Export Script: Creating session...")
+        async with AsyncSession(async_engine) as session:
+            manifest = await export_catalog_snapshot(session, snapshot_dir)
+            print(f"Export finished: version {manifest['version']} ({manifest['sets_count']} sets, {manifest['cards_count']} cards).")
+    finally:
+        await release_sync_lock(lock_conn)
+
+
+if __name__ == "__main__":
+    # Target directory: first argument, else CATALOG_SNAPSHOT_DIR from the environment/.env
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else settings.CATALOG_SNAPSHOT_DIR
+    if not target_dir:
+        print("ERROR: No snapshot directory. Pass it as an argument or set CATALOG_SNAPSHOT_DIR.")
+        sys.exit(1)
+    print(f"Running Catalog Snapshot Export Script into '{target_dir}'...")
+    try:
+        asyncio.run(main(target_dir))
+    except Exception as e:
+        print(f"\n[CRITICAL ERROR] An error occurred in the main execution block: {e}")
+        import traceback
+        print(traceback.format_exc())
+    finally:
+        print("\nExport script execution attempt finished.")
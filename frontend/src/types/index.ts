@@ -15,6 +15,7 @@ export interface ApiCard {
     id: string;
     name: string;
     number?: string | null;
+    sort_key?: string | null; // Natural-order key for number, computed by the backend
     rarity?: string | null;
     type?: string | null;
     subtype?: string | null;